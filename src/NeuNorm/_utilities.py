@@ -1,6 +1,11 @@
 import os
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, NumPy is used instead
+    njit = None
+
 im_ext = [
     ".fits",
     ".tiff",
@@ -14,24 +19,134 @@ im_ext = [
     ".he5",
 ]
 
+# position of the 8 pixels surrounding a pixel (y, x)
+neighbor_offsets = [
+    (-1, -1),
+    (-1, 0),
+    (-1, 1),
+    (0, -1),
+    (0, 1),
+    (1, -1),
+    (1, 0),
+    (1, 1),
+]
+
 
-def get_sorted_list_images(folder=""):
+def get_sorted_list_images(folder="", full_path=False):
     """return the list of images sorted that have the correct format
 
+    The folder is listed with a single os.scandir pass, the file type of each entry
+    comes from the directory listing itself (no stat per file on most file systems).
+
     Parameters:
        folder: string of the path containing the images
+       full_path: boolean - return the full path of the images instead of their names (default False)
 
     Return:
        sorted list of only images that can be read by program
     """
-    filenames = [
-        name for name in os.listdir(folder) if name.lower().endswith(tuple(im_ext))
-    ]
-    filenames.sort()
-    return filenames
+    with os.scandir(folder) as entries:
+        list_entries = [
+            _entry
+            for _entry in entries
+            if _entry.name.lower().endswith(tuple(im_ext)) and _entry.is_file()
+        ]
+    list_entries.sort(key=lambda _entry: _entry.name)
+    if full_path:
+        return [_entry.path for _entry in list_entries]
+    return [_entry.name for _entry in list_entries]
 
 
 def average_df(df=[]):
     """if more than 1 DF have been provided, we need to average them"""
     mean_average = np.mean(df, axis=0)
     return mean_average
+
+
+def quantize_to_uint16(data=None, percentiles=(0.1, 99.9)):
+    """linearly map the data to the full uint16 range
+
+    The values between the low and high percentiles of the full data set are spread over
+    [0, 65535], the values outside are clipped. The data can be recovered (with a precision
+    of (high - low) / 65535) using: data = quantized * (high - low) / 65535 + low
+
+    Parameters:
+        data: numpy array of the data to quantize
+        percentiles: tuple of the low and high percentiles kept (default (0.1, 99.9))
+
+    Returns:
+        [quantized data, low, high] - uint16 numpy array and the values mapped to 0 and 65535
+    """
+    data = np.asarray(data)
+    uint16_max = np.iinfo(np.uint16).max
+    low, high = (float(_value) for _value in np.percentile(data, percentiles))
+    scale = np.float32(uint16_max / (high - low) if high > low else 0.0)
+
+    # scaled one frame at a time in float32, only a frame sized temporary array is
+    # allocated on top of the uint16 output
+    quantized = np.empty(data.shape, dtype=np.uint16)
+    _frames = data.reshape((-1,) + data.shape[-2:])
+    _quantized_frames = quantized.reshape(_frames.shape)
+    _scaled = np.empty(_frames.shape[1:], dtype=np.float32)
+    for _frame, _quantized_frame in zip(_frames, _quantized_frames):
+        np.subtract(_frame, np.float32(low), out=_scaled, casting="same_kind")
+        _scaled *= scale
+        np.clip(_scaled, 0, uint16_max, out=_scaled)
+        np.rint(_scaled, out=_scaled)
+        _quantized_frame[...] = _scaled
+    return [quantized, low, high]
+
+
+def replace_gamma_pixels(data=None, gamma_indexes=None):
+    """replace the gamma pixels by the average value of the 8 pixels surrounding them
+
+    Only the neighbors of the gamma pixels are read. Pixels falling outside the image count as 0,
+    which gives the same result as a 3x3 mean convolution using mode='constant'. The averages
+    are computed by a numba kernel when numba is installed.
+
+    Parameters:
+        data: 2D numpy array, modified in place
+        gamma_indexes: tuple of the (y, x) arrays of the gamma pixels, as returned by np.where
+
+    Returns:
+        2D numpy array with the gamma pixels replaced
+    """
+    ys, xs = gamma_indexes
+    if len(ys) == 0:
+        return data
+
+    height, width = np.shape(data)
+    if (njit is not None) and data.dtype.isnative and (data.dtype.kind in "iuf"):
+        neighbor_mean = np.empty(len(ys), dtype=np.float64)
+        _neighbor_mean(data, ys, xs, neighbor_mean, height, width)
+    else:
+        neighbor_sum = np.zeros(len(ys), dtype=np.float64)
+        for dy, dx in neighbor_offsets:
+            _ys = ys + dy
+            _xs = xs + dx
+            inside = (_ys >= 0) & (_ys < height) & (_xs >= 0) & (_xs < width)
+            neighbor_sum[inside] += data[_ys[inside], _xs[inside]]
+        neighbor_mean = neighbor_sum / 8.0
+
+    data[ys, xs] = neighbor_mean
+    return data
+
+
+if njit is not None:
+    # not parallel: the files are already filtered from several loader threads at once, and
+    # launching a numba parallel region from many threads hangs with the TBB threading layer
+    @njit(cache=True, nogil=True)
+    def _neighbor_mean(data, ys, xs, out, height, width):
+        """numba kernel filling out[i] with the mean of the 8 neighbors of (ys[i], xs[i])"""
+        for i in range(len(ys)):
+            neighbor_sum = 0.0
+            for dy in range(-1, 2):
+                y = ys[i] + dy
+                if (y < 0) or (y >= height):
+                    continue
+                for dx in range(-1, 2):
+                    x = xs[i] + dx
+                    if ((dy == 0) and (dx == 0)) or (x < 0) or (x >= width):
+                        continue
+                    neighbor_sum += data[y, x]
+            out[i] = neighbor_sum / 8.0
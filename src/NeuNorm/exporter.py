@@ -1,13 +1,97 @@
-from PIL import Image
+import io
+
+import numpy as np
+import PIL
+from PIL import Image, TiffImagePlugin
 from astropy.io import fits
 
+# size of the buffer used when writing the files (1 MiB)
+write_buffer_size = 1 << 20
+
+# private tif tags used to save the range of the quantized data
+quantization_low_tag = 65000
+quantization_high_tag = 65001
+
+# largest data set written as a compressed (classic, 32 bits offsets) multipage tif,
+# with a margin for the headers and the data that do not compress
+classic_tiff_max_nbytes = int(0.99 * 2**32)
+
+# the big_tiff save option exists from Pillow 11.1, older versions ignore it and write
+# classic TIFF
+big_tiff_supported = tuple(int(_v) for _v in PIL.__version__.split(".")[:2]) >= (11, 1)
+
+# tif tags describing the pixel format of the input files (BitsPerSample, SampleFormat)
+pixel_format_tags = (258, 339)
+
+
+def make_tif(data=[], metadata=[], file_name="", compression=None):
+    """create tif file
 
-def make_tif(data=[], metadata=[], file_name=""):
-    """create tif file"""
+    compression is the name of a Pillow TIFF compression, ex: 'tiff_adobe_deflate' (zlib)
+    or 'tiff_lzw'. The file is not compressed when None
+
+    The image is encoded in memory then written to the file in 1 call, the encoder
+    seeks and writes many small blocks which are slow on network file systems
+    """
     new_image = Image.fromarray(data)
-    new_image.save(file_name, tiffinfo=metadata)
+    _buffer = io.BytesIO()
+    if compression is None:
+        new_image.save(_buffer, format="TIFF", tiffinfo=metadata)
+    else:
+        new_image.save(
+            _buffer, format="TIFF", tiffinfo=metadata, compression=compression
+        )
+    with open(file_name, "wb", buffering=write_buffer_size) as _file:
+        _file.write(_buffer.getbuffer())
+
+
+def make_multipage_tif(data=[], metadata=[], file_name="", compression=None):
+    """create a single tif file with 1 page per image
+
+    Each page keeps its own metadata. The pages are appended straight to the file (the
+    stack is not encoded in memory first) as a BigTIFF, so the file can be over 4 GiB.
+    Pillow writes the compressed files with libtiff as classic TIFF, those are limited
+    to 4 GiB, as are all the files with Pillow older than 11.1
+
+    Raises:
+        ValueError if the file could be over the 4 GiB of a classic TIFF
+    """
+    if (compression is not None) or (not big_tiff_supported):
+        _nbytes = sum(np.asarray(_data).nbytes for _data in data)
+        if _nbytes > classic_tiff_max_nbytes:
+            if compression is not None:
+                raise ValueError(
+                    "compressed multipage tif files are limited to 4 GiB, "
+                    "export without compression for larger data sets"
+                )
+            raise ValueError(
+                "multipage tif files over 4 GiB require Pillow 11.1 or newer"
+            )
+
+    with TiffImagePlugin.AppendingTiffWriter(file_name, new=True) as _tiff_writer:
+        for _data, _metadata in zip(data, metadata):
+            new_image = Image.fromarray(_data)
+            if compression is None:
+                new_image.save(
+                    _tiff_writer, format="TIFF", tiffinfo=_metadata, big_tiff=True
+                )
+            else:
+                new_image.save(
+                    _tiff_writer,
+                    format="TIFF",
+                    tiffinfo=_metadata,
+                    compression=compression,
+                )
+            _tiff_writer.newFrame()
 
 
 def make_fits(data=[], file_name=""):
-    """create fits file"""
-    fits.writeto(file_name, data, overwrite=True)
+    """create fits file
+
+    Like make_tif, the file is built in memory then written in 1 call, astropy writes
+    the header cards and data in many small blocks
+    """
+    _buffer = io.BytesIO()
+    fits.PrimaryHDU(data).writeto(_buffer)
+    with open(file_name, "wb", buffering=write_buffer_size) as _file:
+        _file.write(_buffer.getbuffer())
@@ -5,13 +5,26 @@ import numpy as np
 import os
 import logging
 import copy
-from scipy.ndimage import convolve
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from tqdm.auto import tqdm
 
 from NeuNorm.loader import load_tiff, load_fits
-from NeuNorm.exporter import make_fits, make_tif
+from NeuNorm.exporter import (
+    make_fits,
+    make_tif,
+    make_multipage_tif,
+    pixel_format_tags,
+    quantization_low_tag,
+    quantization_high_tag,
+)
 from NeuNorm.roi import ROI
-from NeuNorm._utilities import get_sorted_list_images, average_df
+from NeuNorm._utilities import (
+    get_sorted_list_images,
+    average_df,
+    replace_gamma_pixels,
+    quantize_to_uint16,
+)
 from NeuNorm import DataType
 
 
@@ -19,13 +32,12 @@ class Normalization:
     working_data_type = np.float32
 
     def __init__(self):
-        self.shape = {"width": np.nan, "height": np.nan}
         self.dict_image = {
             "data": None,
             "oscilation": None,
             "file_name": None,
             "metadata": None,
-            "shape": copy.deepcopy(self.shape),
+            "shape": None,
         }
         self.dict_ob = {
             "data": None,
@@ -33,14 +45,14 @@ class Normalization:
             "metadata": None,
             "file_name": None,
             "data_mean": None,
-            "shape": copy.deepcopy(self.shape),
+            "shape": None,
         }
         self.dict_df = {
             "data": None,
             "metadata": None,
             "data_average": None,
             "file_name": None,
-            "shape": copy.deepcopy(self.shape),
+            "shape": None,
         }
 
         __roi_dict = {"x0": np.nan, "x1": np.nan, "y0": np.nan, "y1": np.nan}
@@ -57,6 +69,12 @@ class Normalization:
             "bin": False,
         }
 
+        # the frames of each data type are stored in a single (N, H, W) array, allocated
+        # once per load call. self.data[data_type]["data"] is a view of the loaded frames. Only
+        # weak references are kept here, the buffer is freed as soon as the data of this
+        # type is replaced (ex: by normalization with roi or df correction)
+        self.__data_buffer = {"sample": None, "ob": None, "df": None}
+
         self.data = {}
         self.data["sample"] = self.dict_image
         self.data["ob"] = self.dict_ob
@@ -91,6 +109,9 @@ class Normalization:
            notebooks: boolean - turn on this option if you run the library from a
              notebook to have a progress bar displayed showing you the progress of the loading (default False)
             manual_gamma_threshold: float between 0 and 1 - manual gamma coefficient to use (default 0.1)
+            check_shape: boolean - save and check the shape of the data loaded (default True). When False,
+                files of a different shape can be loaded, the data of this type are then kept as a list of 2D
+                arrays instead of a single (N, H, W) array.
 
         Warning:
             Algorithm won't be allowed to run if any of the main algorithm have been run already, such as
@@ -98,8 +119,7 @@ class Normalization:
 
         """
 
-        list_exec_flag = [_flag for _flag in self.__exec_process_status.values()]
-        if True in list_exec_flag:
+        if any(self.__exec_process_status.values()):
             raise IOError(
                 "Operation not allowed as you already worked on this data set!"
             )
@@ -115,60 +135,95 @@ class Normalization:
                     check_shape=check_shape,
                 )
             elif isinstance(file, list):
-                # use tqdm to handle the progress bar
-                if notebook:
-                    for _file in tqdm(file, desc=f"Loading {data_type}", leave=False):
-                        self.load_file(
-                            file=_file,
-                            data_type=data_type,
-                            auto_gamma_filter=auto_gamma_filter,
-                            manual_gamma_filter=manual_gamma_filter,
-                            manual_gamma_threshold=manual_gamma_threshold,
-                            check_shape=check_shape,
-                        )
-                else:
-                    for _file in file:
-                        self.load_file(
-                            file=_file,
-                            data_type=data_type,
-                            auto_gamma_filter=auto_gamma_filter,
-                            manual_gamma_filter=manual_gamma_filter,
-                            manual_gamma_threshold=manual_gamma_threshold,
-                            check_shape=check_shape,
-                        )
+                self.__load_list_of_files(
+                    list_files=file,
+                    data_type=data_type,
+                    auto_gamma_filter=auto_gamma_filter,
+                    manual_gamma_filter=manual_gamma_filter,
+                    notebook=notebook,
+                    manual_gamma_threshold=manual_gamma_threshold,
+                    check_shape=check_shape,
+                )
 
         elif not folder == "":
-            # load all files from folder
-            list_images = get_sorted_list_images(folder=folder)
-            # use tqdm to handle the progress bar
-            if notebook:
-                for _image in tqdm(
-                    list_images, desc=f"Loading {data_type}", leave=False
-                ):
-                    full_path_image = os.path.join(folder, _image)
-                    self.load_file(
-                        file=full_path_image,
-                        data_type=data_type,
-                        auto_gamma_filter=auto_gamma_filter,
-                        manual_gamma_filter=manual_gamma_filter,
-                        manual_gamma_threshold=manual_gamma_threshold,
-                        check_shape=check_shape,
-                    )
-            else:
-                for _image in list_images:
-                    full_path_image = os.path.join(folder, _image)
-                    self.load_file(
-                        file=full_path_image,
-                        data_type=data_type,
-                        auto_gamma_filter=auto_gamma_filter,
-                        manual_gamma_filter=manual_gamma_filter,
-                        manual_gamma_threshold=manual_gamma_threshold,
-                        check_shape=check_shape,
-                    )
+            # load all files from folder, they are known to exist from the listing
+            list_files = get_sorted_list_images(folder=folder, full_path=True)
+            self.__load_list_of_files(
+                list_files=list_files,
+                data_type=data_type,
+                auto_gamma_filter=auto_gamma_filter,
+                manual_gamma_filter=manual_gamma_filter,
+                notebook=notebook,
+                manual_gamma_threshold=manual_gamma_threshold,
+                check_shape=check_shape,
+                check_file_exists=False,
+            )
 
         elif data is not None:
             self.load_data(data=data, data_type=data_type, notebook=notebook)
 
+    def __load_list_of_files(
+        self,
+        list_files=[],
+        data_type="sample",
+        auto_gamma_filter=True,
+        manual_gamma_filter=False,
+        notebook=False,
+        manual_gamma_threshold=0.1,
+        check_shape=True,
+        check_file_exists=True,
+    ):
+        """load a list of files, reading them in parallel
+
+        The files are read and gamma filtered by a pool of threads (decoding releases the GIL),
+        then saved one at a time, in the order of the list.
+
+        Parameters:
+           list_files: list - full path of the files to load
+           data_type: string - 'sample', 'ob' or 'df (default 'sample')
+           auto_gamma_filter: boolean - apply or not the automatic gamma filtering (default True)
+           manual_gamma_filter: boolean - apply or not the manual gamma filtering (default False)
+           notebook: boolean - display a progress bar (default False)
+           manual_gamma_threshold: float between 0 and 1 - manual gamma coefficient to use (default 0.1)
+           check_shape: boolean - check that all the files have the same shape (default True)
+           check_file_exists: boolean - check each file exists before reading it, can be turned off
+                when the list comes from a folder listing (default True)
+        """
+        max_workers = min(os.cpu_count() or 1, 8)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list_data_metadata = executor.map(
+                lambda _file: self._read_file(
+                    file=_file,
+                    auto_gamma_filter=auto_gamma_filter,
+                    manual_gamma_filter=manual_gamma_filter,
+                    manual_gamma_threshold=manual_gamma_threshold,
+                    check_file_exists=check_file_exists,
+                ),
+                list_files,
+            )
+
+            # use tqdm to handle the progress bar
+            if notebook:
+                list_data_metadata = tqdm(
+                    list_data_metadata,
+                    total=len(list_files),
+                    desc=f"Loading {data_type}",
+                    leave=False,
+                )
+
+            _nbr_files = len(list_files)
+            for _index, [_file, [_data, _metadata]] in enumerate(
+                zip(list_files, list_data_metadata)
+            ):
+                self.__save_file_data(
+                    file=_file,
+                    data=_data,
+                    metadata=_metadata,
+                    data_type=data_type,
+                    check_shape=check_shape,
+                    nbr_expected=_nbr_files - _index,
+                )
+
     def calculate_how_long_its_going_to_take(
         self, index_we_are=-1, time_it_took_so_far=0, total_number_of_loop=1
     ):
@@ -208,42 +263,127 @@ class Normalization:
             notebook: boolean - turn on this option if you run the library from a
                  notebook to have a progress bar displayed showing you the progress of the loading (default False)
         """
+        data = np.asarray(data, dtype=self.working_data_type)
         if len(np.shape(data)) > 2:
             # use tqdm to handle the progress bar
             if notebook:
-                for _data in tqdm(data, desc=f"Loading {data_type}", leave=False):
-                    _data = _data.astype(self.working_data_type)
-                    self.__load_individual_data(data=_data, data_type=data_type)
+                _nbr_data = len(data)
+                for _index, _data in enumerate(
+                    tqdm(data, desc=f"Loading {data_type}", leave=False)
+                ):
+                    self.__load_individual_data(
+                        data=_data,
+                        data_type=data_type,
+                        nbr_expected=_nbr_data - _index,
+                    )
             else:
-                for _data in data:
-                    _data = _data.astype(self.working_data_type)
-                    self.__load_individual_data(data=_data, data_type=data_type)
+                # the full stack is copied at once
+                self.__load_individual_data(data=data, data_type=data_type)
 
         else:
-            data = data.astype(self.working_data_type)
             self.__load_individual_data(data=data, data_type=data_type)
 
-    def __load_individual_data(self, data=None, data_type="sample"):
-        """method that loads the data one at a time
+    def __load_individual_data(self, data=None, data_type="sample", nbr_expected=0):
+        """method that loads the data one frame (2D) or one stack of frames (3D) at a time
 
         Parameters:
             data: np array
             data_type: string - 'data', 'ob' or 'df' (default 'sample')
+            nbr_expected: int - number of frames that are going to be loaded, including
+                this one (default 0)
         """
-        if self.data[data_type]["data"] is None:
-            self.data[data_type]["data"] = [data]
-        else:
-            self.data[data_type]["data"].append(data)
-        index = len(self.data[data_type]["data"])
+        self.__append_data(data=data, data_type=data_type, nbr_expected=nbr_expected)
+
+        nbr_data = len(self.data[data_type]["data"])
+        nbr_new_data = 1 if np.ndim(data) == 2 else len(data)
+        list_index = range(nbr_data - nbr_new_data + 1, nbr_data + 1)
+        list_file_name = ["image_{:04}".format(_index) for _index in list_index]
+        list_metadata = ["" for _index in list_index]
+
         if self.data[data_type]["file_name"] is None:
-            self.data[data_type]["file_name"] = ["image_{:04}".format(index)]
+            self.data[data_type]["file_name"] = list_file_name
         else:
-            self.data[data_type]["file_name"].append("image_{:04}".format(index))
+            self.data[data_type]["file_name"].extend(list_file_name)
         if self.data[data_type]["metadata"] is None:
-            self.data[data_type]["metadata"] = [""]
+            self.data[data_type]["metadata"] = list_metadata
+        else:
+            self.data[data_type]["metadata"].extend(list_metadata)
+        self.save_or_check_shape(
+            data=self.data[data_type]["data"][-1], data_type=data_type
+        )
+
+    def __append_data(
+        self, data=None, data_type="sample", nbr_expected=0, check_shape=True
+    ):
+        """append one frame (2D) or a stack of frames (3D) to the data of this type
+
+        The frames are copied into a (N, H, W) buffer, so the data of each type always stay
+        in a single contiguous array. When it is full, the buffer is reallocated with room for
+        exactly the nbr_expected frames of the current load call: the data keep a view of the
+        buffer, any unused frame would stay allocated as long as the data. Loading files one
+        at a time copies the frames already loaded at each call, a list of files or a folder
+        is loaded with a single allocation.
+
+        Parameters:
+            data: np array 2D or 3D
+            data_type: string - 'sample', 'ob' or 'df' (default 'sample')
+            nbr_expected: int - number of frames that are going to be loaded, including
+                the ones of data, used to allocate the buffer at once (default 0)
+            check_shape: boolean - when False, frames of a different shape are accepted and
+                the data of this type are kept as a list of 2D arrays (default True)
+
+        Raises:
+            IOError if the shape of the frames do not match the data already loaded
+        """
+        data = np.asarray(data)
+        if data.ndim == 2:
+            data = data[np.newaxis]
+
+        _current_data = self.data[data_type]["data"]
+
+        # frames of different shapes can not share a buffer, they are kept as a list
+        if (not check_shape) and (_current_data is not None):
+            if isinstance(_current_data, list) or (
+                np.shape(_current_data)[1:] != data.shape[1:]
+            ):
+                self.data[data_type]["data"] = list(_current_data) + list(data)
+                return
+
+        _buffer_reference = self.__data_buffer[data_type]
+        _buffer = None if _buffer_reference is None else _buffer_reference()
+
+        # result_type also gives the native byte order of big-endian files
+        if _current_data is None:
+            nbr_current = 0
+            dtype = np.result_type(data)
         else:
-            self.data[data_type]["metadata"].append("")
-        self.save_or_check_shape(data=data, data_type=data_type)
+            _current_data = np.asarray(_current_data)
+            if _current_data.shape[1:] != data.shape[1:]:
+                raise IOError(
+                    "Shape of {} do not match previous loaded data set!".format(
+                        data_type
+                    )
+                )
+            nbr_current = len(_current_data)
+            dtype = np.result_type(_current_data, data)
+
+        nbr_total = nbr_current + len(data)
+        _buffer_can_be_used = (
+            (_buffer is not None)
+            and (nbr_current > 0)
+            and (_current_data.base is _buffer)
+            and (nbr_total <= len(_buffer))
+            and (_buffer.dtype == dtype)
+        )
+        if not _buffer_can_be_used:
+            _capacity = max(nbr_total, nbr_current + nbr_expected)
+            _buffer = np.empty((_capacity,) + data.shape[1:], dtype=dtype)
+            if nbr_current > 0:
+                _buffer[:nbr_current] = _current_data
+            self.__data_buffer[data_type] = weakref.ref(_buffer)
+
+        _buffer[nbr_current:nbr_total] = data
+        self.data[data_type]["data"] = _buffer[:nbr_total]
 
     def load_file(
         self,
@@ -270,53 +410,114 @@ class Normalization:
             OSError: if any other any file format requested
 
         """
+        [data, metadata] = self._read_file(
+            file=file,
+            auto_gamma_filter=auto_gamma_filter,
+            manual_gamma_filter=manual_gamma_filter,
+            manual_gamma_threshold=manual_gamma_threshold,
+        )
+        self.__save_file_data(
+            file=file,
+            data=data,
+            metadata=metadata,
+            data_type=data_type,
+            check_shape=check_shape,
+        )
+
+    def _read_file(
+        self,
+        file="",
+        auto_gamma_filter=True,
+        manual_gamma_filter=False,
+        manual_gamma_threshold=0.1,
+        check_file_exists=True,
+    ):
+        """read and gamma filter a FITS or TIFF file, without saving it into self.data
+
+        Parameters
+            file : string - full path of the input file with his extension.
+            auto_gamma_filter: boolean - flag to turn on or off the auto gamma filering (default True)
+            manual_gamma_filter: boolean  - apply or not gamma filtering (default False)
+            manual_gamma_threshold: float (between 0 and 1) - manual gamma threshold
+            check_file_exists: boolean - check the file exists before reading it (default True)
+
+        Returns:
+            [data, metadata] - numpy array of the data and dictionary of the metadata
+
+        Raises:
+            OSError: if file does not exist
+            NotImplementedError: if file is HDF5
+            OSError: if any other any file format requested
+        """
         my_file = Path(file)
-        if my_file.is_file():
-            metadata = {}
-            if file.lower().endswith(".fits"):
-                data = np.array(load_fits(my_file))
-            elif file.lower().endswith((".tiff", ".tif")):
-                [data, metadata] = load_tiff(my_file)
-                data = np.array(data)
-            elif file.lower().endswith(
-                (".hdf", ".h4", ".hdf4", ".he2", "h5", ".hdf5", ".he5")
-            ):
-                raise NotImplementedError
-            #     data = np.array(load_hdf(my_file))
-            else:
-                raise OSError(
-                    "file extension not yet implemented....Do it your own way!"
-                )
+        if check_file_exists and not my_file.is_file():
+            raise OSError("The file name does not exist")
 
-            if auto_gamma_filter:
-                data = self._auto_gamma_filtering(data=data)
-            elif manual_gamma_filter:
-                data = self._manual_gamma_filtering(
-                    data=data, manual_gamma_threshold=manual_gamma_threshold
-                )
+        # the arrays returned by the loaders are used as is (native dtype), they are only
+        # copied by the gamma filtering or when saved into the data stack
+        metadata = {}
+        if file.lower().endswith(".fits"):
+            data = np.asarray(load_fits(my_file))
+        elif file.lower().endswith((".tiff", ".tif")):
+            [data, metadata] = load_tiff(my_file)
+            data = np.asarray(data)
+        elif file.lower().endswith(
+            (".hdf", ".h4", ".hdf4", ".he2", "h5", ".hdf5", ".he5")
+        ):
+            raise NotImplementedError
+        #     data = np.array(load_hdf(my_file))
+        else:
+            raise OSError("file extension not yet implemented....Do it your own way!")
 
-            data = np.squeeze(data)
+        if auto_gamma_filter:
+            data = self._auto_gamma_filtering(data=data)
+        elif manual_gamma_filter:
+            data = self._manual_gamma_filtering(
+                data=data, manual_gamma_threshold=manual_gamma_threshold
+            )
 
-            if self.data[data_type]["data"] is None:
-                self.data[data_type]["data"] = [data]
-            else:
-                self.data[data_type]["data"].append(data)
+        data = np.squeeze(data)
+        return [data, metadata]
 
-            if self.data[data_type]["metadata"] is None:
-                self.data[data_type]["metadata"] = [metadata]
-            else:
-                self.data[data_type]["metadata"].append(metadata)
+    def __save_file_data(
+        self,
+        file="",
+        data=None,
+        metadata=None,
+        data_type="sample",
+        check_shape=True,
+        nbr_expected=0,
+    ):
+        """save the data, metadata and file name of a file read into self.data
 
-            if self.data[data_type]["file_name"] is None:
-                self.data[data_type]["file_name"] = [file]
-            else:
-                self.data[data_type]["file_name"].append(file)
+        Parameters:
+            file: string - full path of the file
+            data: numpy array of the data
+            metadata: dictionary of the metadata
+            data_type: string - 'sample', 'df' or 'ob' (default 'sample')
+            check_shape: boolean - check the shape matches the data already loaded (default True)
+            nbr_expected: int - number of files that are going to be loaded, including
+                this one (default 0)
+        """
+        self.__append_data(
+            data=data,
+            data_type=data_type,
+            nbr_expected=nbr_expected,
+            check_shape=check_shape,
+        )
 
-            if check_shape:
-                self.save_or_check_shape(data=data, data_type=data_type)
+        if self.data[data_type]["metadata"] is None:
+            self.data[data_type]["metadata"] = [metadata]
+        else:
+            self.data[data_type]["metadata"].append(metadata)
 
+        if self.data[data_type]["file_name"] is None:
+            self.data[data_type]["file_name"] = [file]
         else:
-            raise OSError("The file name does not exist")
+            self.data[data_type]["file_name"].append(file)
+
+        if check_shape:
+            self.save_or_check_shape(data=data, data_type=data_type)
 
     def _auto_gamma_filtering(self, data=None):
         """perform the automatic gamma filtering
@@ -325,7 +526,8 @@ class Normalization:
         and will determine the maxixum value for this data type. Any pixel that have a value
         above the max value - 5 (just to give it a little bit of range) will be considered as
         being gamma pixels. Those pixels will be replaced by the average value of the 8 pixels
-        surrounding this pixel
+        surrounding this pixel (only the neighbors of the gamma pixels are read).
+        Float data can not saturate, they are only converted to the working data type.
 
         Parameters:
             data: np array
@@ -340,29 +542,24 @@ class Normalization:
             raise ValueError("Data array is empty!")
 
         # we may be dealing with a float time, that means it does not need any gamma filtering
+        if np.issubdtype(data.dtype, np.floating):
+            return data.astype(self.working_data_type, copy=False)
 
         try:
-            data_type = data.dtype
-            if data_type in [float, "float32"]:
-                max = np.finfo(data_type).max
-            else:
-                max = np.iinfo(data.dtype).max
+            max = np.iinfo(data.dtype).max
         except Exception as error:
             logging.warning(f"Use default max value for data type: {error}")
             return data
 
         manual_gamma_threshold = max - 5
-        new_data = np.array(data, self.working_data_type)
-
-        data_gamma_filtered = np.copy(new_data)
+        # the conversion of the integer data to the working data type is the only copy made
+        new_data = np.asarray(data, dtype=self.working_data_type)
         gamma_indexes = np.where(new_data > manual_gamma_threshold)
 
-        mean_kernel = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]]) / 8.0
-        convolved_data = convolve(data_gamma_filtered, mean_kernel, mode="constant")
-
-        data_gamma_filtered[gamma_indexes] = convolved_data[gamma_indexes]
-
-        return data_gamma_filtered
+        # do not replace this by a full image convolution (scipy.signal.fftconvolve or
+        # ndimage): FFT only pays off for large kernels, and with a 3x3 kernel only the
+        # 8 neighbors of the few gamma pixels need to be read
+        return replace_gamma_pixels(data=new_data, gamma_indexes=gamma_indexes)
 
     def _manual_gamma_filtering(self, data=None, manual_gamma_threshold=0.1):
         """perform manual gamma filtering on the data
@@ -386,18 +583,21 @@ class Normalization:
         if data is None:
             raise ValueError("Data array is empty!")
 
-        data_gamma_filtered = np.copy(data)
-        mean_counts = np.mean(data_gamma_filtered)
-        gamma_indexes = np.where(
-            manual_gamma_threshold * data_gamma_filtered > mean_counts
-        )
-
-        mean_kernel = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]]) / 8.0
-        convolved_data = convolve(data_gamma_filtered, mean_kernel, mode="constant")
+        mean_counts = np.mean(data)
+        if manual_gamma_threshold > 0:
+            # same test, without allocating the scaled copy of the full image
+            gamma_indexes = np.where(data > mean_counts / manual_gamma_threshold)
+        else:
+            gamma_indexes = np.where(manual_gamma_threshold * data > mean_counts)
 
-        data_gamma_filtered[gamma_indexes] = convolved_data[gamma_indexes]
+        # the data are only copied when there are gamma pixels to replace
+        if len(gamma_indexes[0]) == 0:
+            return data
 
-        return data_gamma_filtered
+        data_gamma_filtered = np.copy(data)
+        return replace_gamma_pixels(
+            data=data_gamma_filtered, gamma_indexes=gamma_indexes
+        )
 
     def save_or_check_shape(self, data=None, data_type="sample"):
         """save the shape for the first data loaded (of each type) otherwise
@@ -410,17 +610,11 @@ class Normalization:
         Raises:
             IOError if size do not match
         """
-        [height, width] = np.shape(data)
-        if np.isnan(self.data[data_type]["shape"]["height"]):
-            _shape = copy.deepcopy(self.shape)
-            _shape["height"] = height
-            _shape["width"] = width
-            self.data[data_type]["shape"] = _shape
+        # the shape is stored as the (height, width) tuple of the first frame
+        if self.data[data_type]["shape"] is None:
+            self.data[data_type]["shape"] = data.shape
         else:
-            _prev_width = self.data[data_type]["shape"]["width"]
-            _prev_height = self.data[data_type]["shape"]["height"]
-
-            if (not (_prev_width == width)) or (not (_prev_height == height)):
+            if self.data[data_type]["shape"] != data.shape:
                 raise IOError(
                     "Shape of {} do not match previous loaded data set!".format(
                         data_type
@@ -487,35 +681,20 @@ class Normalization:
         if not use_only_sample:
             if roi:
                 b_list_roi = self.check_roi_format(roi)
+                if not b_list_roi:
+                    roi = [roi]
 
-                if b_list_roi:
-                    _sample_corrected_normalized = self.calculate_corrected_normalized(
-                        data_type=DataType.sample, roi=roi
-                    )
-                    _ob_corrected_normalized = self.calculate_corrected_normalized(
-                        data_type=DataType.ob, roi=roi
-                    )
-
-                else:
-                    _x0 = roi.x0
-                    _y0 = roi.y0
-                    _x1 = roi.x1
-                    _y1 = roi.y1
-
-                    _sample_corrected_normalized = [
-                        _sample / np.mean(_sample[_y0 : _y1 + 1, _x0 : _x1 + 1])
-                        for _sample in self.data["sample"]["data"]
-                    ]
-                    _ob_corrected_normalized = [
-                        _ob / np.mean(_ob[_y0 : _y1 + 1, _x0 : _x1 + 1])
-                        for _ob in self.data["ob"]["data"]
-                    ]
+                _sample_corrected_normalized = self.calculate_corrected_normalized(
+                    data_type=DataType.sample, roi=roi
+                )
+                _ob_corrected_normalized = self.calculate_corrected_normalized(
+                    data_type=DataType.ob, roi=roi
+                )
 
             else:
-                _sample_corrected_normalized = copy.deepcopy(
-                    self.data["sample"]["data"]
-                )
-                _ob_corrected_normalized = copy.deepcopy(self.data["ob"]["data"])
+                # frames are not modified in place below, no copy is needed
+                _sample_corrected_normalized = self.data["sample"]["data"]
+                _ob_corrected_normalized = self.data["ob"]["data"]
 
             self.data[DataType.sample]["data"] = _sample_corrected_normalized
             self.data[DataType.ob]["data"] = _ob_corrected_normalized
@@ -526,74 +705,54 @@ class Normalization:
             if (
                 (nbr_sample != nbr_ob) or force_mean_ob or force_median_ob
             ):  # work with mean ob
-                if force_median_ob:
-                    _ob_corrected_normalized = np.nanmedian(
-                        _ob_corrected_normalized, axis=0
-                    )
-                elif force_mean_ob:
-                    _ob_corrected_normalized = np.nanmean(
-                        _ob_corrected_normalized, axis=0
-                    )
+                # the nan-aware reductions are much slower, only use them when needed
+                _ob_stack = np.asarray(_ob_corrected_normalized)
+                _ob_has_nan = np.isnan(_ob_stack).any()
+
+                if force_mean_ob and not force_median_ob:
+                    if _ob_has_nan:
+                        _ob_corrected_normalized = np.nanmean(_ob_stack, axis=0)
+                    else:
+                        _ob_corrected_normalized = np.mean(_ob_stack, axis=0)
                 else:
-                    _ob_corrected_normalized = np.nanmedian(
-                        _ob_corrected_normalized, axis=0
-                    )
+                    if _ob_has_nan:
+                        _ob_corrected_normalized = np.nanmedian(_ob_stack, axis=0)
+                    else:
+                        _ob_corrected_normalized = np.median(_ob_stack, axis=0)
 
                 self.data["ob"]["data_mean"] = _ob_corrected_normalized
-                _working_ob = copy.deepcopy(_ob_corrected_normalized)
-                _working_ob[_working_ob == 0] = np.nan
-
-                if notebook:
-                    # turn on progress bar
-                    _message = "Normalization"
-                    box1 = widgets.HBox(
-                        [
-                            widgets.Label(_message, layout=widgets.Layout(width="20%")),
-                            widgets.IntProgress(max=len(self.data["sample"]["data"])),
-                        ]
-                    )
-                    display(box1)
-                    w1 = box1.children[1]
-
-                normalized_data = []
-                for _index, _sample in enumerate(self.data["sample"]["data"]):
-                    _norm = np.divide(_sample, _working_ob)
-                    _norm[np.isnan(_norm)] = 0
-                    _norm[np.isinf(_norm)] = 0
-                    normalized_data.append(_norm)
-
-                    if notebook:
-                        w1.value = _index + 1
+                _working_ob = _ob_corrected_normalized
 
             else:  # 1 ob for each sample
-                # produce normalized data
-                sample_ob = zip(
-                    self.data[DataType.sample]["data"], self.data[DataType.ob]["data"]
-                )
-
-                if notebook:
-                    # turn on progress bar
-                    _message = "Normalization"
-                    box1 = widgets.HBox(
-                        [
-                            widgets.Label(_message, layout=widgets.Layout(width="20%")),
-                            widgets.IntProgress(max=len(self.data["sample"]["data"])),
-                        ]
-                    )
-                    display(box1)
-                    w1 = box1.children[1]
+                _working_ob = np.asarray(self.data[DataType.ob]["data"])
 
-                normalized_data = []
-                for _index, [_sample, _ob] in enumerate(sample_ob):
-                    _working_ob = copy.deepcopy(_ob)
-                    _working_ob[_working_ob == 0] = np.nan
-                    _norm = np.divide(_sample, _working_ob)
-                    _norm[np.isnan(_norm)] = 0
-                    _norm[np.isinf(_norm)] = 0
-                    normalized_data.append(_norm)
+            if notebook:
+                # turn on progress bar
+                _message = "Normalization"
+                box1 = widgets.HBox(
+                    [
+                        widgets.Label(_message, layout=widgets.Layout(width="20%")),
+                        widgets.IntProgress(max=len(self.data["sample"]["data"])),
+                    ]
+                )
+                display(box1)
+                w1 = box1.children[1]
+
+            # produce normalized data for the full stack at once, the mean ob (2D) is
+            # broadcast over all the samples. Pixels where ob is 0 are not divided and
+            # stay at 0
+            _sample_stack = np.asarray(self.data[DataType.sample]["data"])
+            _normalized_dtype = np.result_type(_sample_stack, _working_ob)
+            if not np.issubdtype(_normalized_dtype, np.inexact):
+                _normalized_dtype = np.float64
+            normalized_data = np.zeros(_sample_stack.shape, dtype=_normalized_dtype)
+            np.divide(
+                _sample_stack, _working_ob, out=normalized_data, where=_working_ob != 0
+            )
+            np.nan_to_num(normalized_data, copy=False, nan=0, posinf=0, neginf=0)
 
-                    if notebook:
-                        w1.value = _index + 1
+            if notebook:
+                w1.value = len(normalized_data)
 
             self.data["normalized"] = normalized_data
 
@@ -610,54 +769,81 @@ class Normalization:
             )
 
         b_list_roi = self.check_roi_format(roi)
+        if not b_list_roi:
+            roi = [roi]
 
-        if b_list_roi:
-            normalized_data = []
-            for _sample in self.data["sample"]["data"]:
-                total_counts_of_rois = 0
-                total_number_of_pixels = 0
-                for _roi in roi:
-                    _x0 = _roi.x0
-                    _y0 = _roi.y0
-                    _x1 = _roi.x1
-                    _y1 = _roi.y1
-                    total_number_of_pixels += (_y1 - _y0 + 1) * (_x1 - _x0 + 1)
-                    total_counts_of_rois += np.sum(
-                        _sample[_y0 : _y1 + 1, _x0 : _x1 + 1]
-                    )
+        return self.calculate_corrected_normalized(data_type=DataType.sample, roi=roi)
 
-                full_sample_mean = total_counts_of_rois / total_number_of_pixels
-                normalized_data.append(_sample / full_sample_mean)
-
-        else:
-            _x0 = roi.x0
-            _y0 = roi.y0
-            _x1 = roi.x1
-            _y1 = roi.y1
+    def calculate_corrected_normalized(self, data_type=DataType.sample, roi=None):
+        """divide each frame by the mean counts of all the pixels of the list of roi
 
-            normalized_data = [
-                _sample / np.mean(_sample[_y0 : _y1 + 1, _x0 : _x1 + 1])
-                for _sample in self.data["sample"]["data"]
-            ]
+        Parameters:
+            data_type: string - 'sample' or 'ob' (default 'sample')
+            roi: list of ROI objects
 
-        return normalized_data
+        Returns:
+            3D numpy array of the corrected frames
+        """
+        _data = np.asarray(self.data[data_type]["data"])
+        total_number_of_pixels = np.sum(
+            [(_roi.y1 - _roi.y0 + 1) * (_roi.x1 - _roi.x0 + 1) for _roi in roi]
+        )
 
-    def calculate_corrected_normalized(self, data_type=DataType.sample, roi=None):
-        corrected_normalized = []
-        for _sample in self.data[data_type]["data"]:
+        # with large or many roi, reading the sums from the integral image of each
+        # frame is cheaper than summing every roi
+        if total_number_of_pixels > np.size(_data[0]):
+            total_counts_of_rois = np.array(
+                [
+                    self.__integral_image_counts_of_rois(data=_frame, roi=roi)
+                    for _frame in _data
+                ]
+            )
+        else:
             total_counts_of_rois = 0
-            total_number_of_pixels = 0
             for _roi in roi:
                 _x0 = _roi.x0
                 _y0 = _roi.y0
                 _x1 = _roi.x1
                 _y1 = _roi.y1
-                total_number_of_pixels += (_y1 - _y0 + 1) * (_x1 - _x0 + 1)
-                total_counts_of_rois += np.sum(_sample[_y0 : _y1 + 1, _x0 : _x1 + 1])
+                total_counts_of_rois += np.sum(
+                    _data[:, _y0 : _y1 + 1, _x0 : _x1 + 1], axis=(1, 2)
+                )
 
-            full_sample_mean = total_counts_of_rois / total_number_of_pixels
-            corrected_normalized.append(_sample / full_sample_mean)
-        return corrected_normalized
+        full_mean = total_counts_of_rois / total_number_of_pixels
+        full_mean = full_mean.astype(np.result_type(_data.dtype, np.float32))
+        # 1 division per frame, then a multiplication of every pixel
+        inverse_full_mean = 1 / full_mean
+        return _data * inverse_full_mean[:, np.newaxis, np.newaxis]
+
+    def __integral_image_counts_of_rois(self, data=None, roi=None):
+        """total counts of all the roi, read from the integral image (summed-area table)
+
+        The integral image is built once, then each roi sum only needs its 4 corners.
+
+        Parameters:
+            data: 2D numpy array
+            roi: list of ROI objects
+
+        Returns:
+            float - sum of the counts of every roi
+        """
+        integral_image = np.cumsum(np.cumsum(data, axis=0, dtype=np.float64), axis=1)
+
+        total_counts_of_rois = 0
+        for _roi in roi:
+            _x0 = _roi.x0
+            _y0 = _roi.y0
+            _x1 = _roi.x1
+            _y1 = _roi.y1
+            _roi_counts = integral_image[_y1, _x1]
+            if _y0 > 0:
+                _roi_counts -= integral_image[_y0 - 1, _x1]
+            if _x0 > 0:
+                _roi_counts -= integral_image[_y1, _x0 - 1]
+            if (_y0 > 0) and (_x0 > 0):
+                _roi_counts += integral_image[_y0 - 1, _x0 - 1]
+            total_counts_of_rois += _roi_counts
+        return total_counts_of_rois
 
     def check_roi_format(self, roi):
         b_list_roi = False
@@ -690,7 +876,7 @@ class Normalization:
             return False
 
         _shape_df = self.data["df"]["shape"]
-        if not np.isnan(_shape_df["height"]):
+        if _shape_df is not None:
             if not (_shape_sample == _shape_df):
                 return False
 
@@ -766,9 +952,14 @@ class Normalization:
         ):
             raise IOError("{} and df data must have the same shape!".format(data_type))
 
-        _data_df_corrected = [_data - _df for _data in self.data[data_type]["data"]]
-        _data_df_corrected = [np.squeeze(_data) for _data in _data_df_corrected]
-        self.data[data_type]["data"] = _data_df_corrected
+        # the df (2D) is subtracted from the full stack at once, in place when the
+        # result keeps the data type of the stack
+        _data = np.asarray(self.data[data_type]["data"])
+        if np.result_type(_data, _df) == _data.dtype:
+            np.subtract(_data, _df, out=_data)
+        else:
+            _data = _data - _df
+        self.data[data_type]["data"] = _data
 
     def crop(self, roi=None, force=False):
         """Cropping the sample and ob normalized data
@@ -795,36 +986,50 @@ class Normalization:
                 return
         self.__exec_process_status["crop"] = True
 
-        _x0 = roi.x0
-        _y0 = roi.y0
-        _x1 = roi.x1
-        _y1 = roi.y1
+        # x1 and y1 of the roi are inclusive, the exclusive slice ends are computed once
+        _rows = slice(roi.y0, roi.y1 + 1)
+        _columns = slice(roi.x0, roi.x1 + 1)
 
-        new_sample = [
-            _data[_y0 : _y1 + 1, _x0 : _x1 + 1] for _data in self.data["sample"]["data"]
-        ]
-        self.data["sample"]["data"] = new_sample
+        for _data_type in [DataType.sample, DataType.ob, DataType.df]:
+            _container = self.data[_data_type]
+            if _container["data"] is not None:
+                _container["data"] = self.__crop_data(
+                    data=_container["data"], rows=_rows, columns=_columns
+                )
 
-        new_ob = [
-            _data[_y0 : _y1 + 1, _x0 : _x1 + 1] for _data in self.data["ob"]["data"]
-        ]
-        self.data["ob"]["data"] = new_ob
+        _normalized = self.data["normalized"]
+        if _normalized is not None:
+            self.data["normalized"] = self.__crop_data(
+                data=_normalized, rows=_rows, columns=_columns
+            )
 
-        if self.data["df"]["data"] is not None:
-            new_df = [
-                _data[_y0 : _y1 + 1, _x0 : _x1 + 1] for _data in self.data["df"]["data"]
-            ]
-            self.data["df"]["data"] = new_df
+        return True
 
-        if self.data["normalized"] is not None:
-            new_normalized = [
-                _data[_y0 : _y1 + 1, _x0 : _x1 + 1] for _data in self.data["normalized"]
-            ]
-            self.data["normalized"] = new_normalized
+    def __crop_data(self, data=None, rows=None, columns=None):
+        """crop every frame of a data set
 
-        return True
+        Parameters:
+            data: 3D numpy array or list of 2D arrays to crop
+            rows: slice of the rows to keep
+            columns: slice of the columns to keep
 
-    def export(self, folder="./", data_type="normalized", file_type="tif"):
+        Returns:
+            cropped data, a view of the input when it is a 3D numpy array
+        """
+        if isinstance(data, np.ndarray):
+            # 1 slice of the full stack, no data copied
+            return data[:, rows, columns]
+        return [_data[rows, columns] for _data in data]
+
+    def export(
+        self,
+        folder="./",
+        data_type="normalized",
+        file_type="tif",
+        compression=None,
+        multipage=False,
+        quantize=False,
+    ):
         """export all the data from the type specified into a folder
 
         Parameters:
@@ -832,18 +1037,41 @@ class Normalization:
                 raised (default is './')
             data_type: String - Must be one of the following 'sample','ob','df','normalized' (default is 'normalized').
             file_type: String - format in which to export the data. Must be either 'tif' or 'fits' (default is 'tif')
+            compression: String - TIFF compression, ex: 'tiff_adobe_deflate' (zlib) or 'tiff_lzw'. Lossless,
+                smaller files are faster to write on slow or network disks. Ignored for fits (default is None,
+                no compression)
+            multipage: Boolean - export all the images as the pages of a single tif file named after the
+                data type, ex: 'normalized_stack.tif'. The file is a BigTIFF, without size limit, a compressed
+                file (or any file with Pillow older than 11.1) is a classic TIFF limited to 4 GiB (default is
+                False, 1 file per image)
+            quantize: Boolean - export the normalized data as uint16 tif files, half the size of float32. The
+                values between the 0.1 and 99.9 percentiles are mapped to [0, 65535], the values mapped to 0
+                and 65535 are saved in the tags 65000 and 65001 of each file (default is False)
 
         Raises:
-            IOError if the folder does not exist
+            IOError if the folder does not exist or is not a folder
             KeyError if data_type can not be found in the list ['normalized','sample','ob','df']
+            ValueError if multipage is requested for another file_type than tif
+            ValueError if a multipage tif file could be over 4 GiB and can not be written as BigTIFF
+            ValueError if quantize is requested for another file_type than tif or data_type than normalized
 
         """
-        if not os.path.exists(folder):
+        if not os.path.isdir(folder):
             raise IOError("Folder '{}' does not exist!".format(folder))
 
         if data_type not in ["normalized", "sample", "ob", "df"]:
             raise KeyError("data_type '{}' is wrong".format(data_type))
 
+        if multipage and file_type not in ["tif", "tiff"]:
+            raise ValueError("multipage export is only available for tif files")
+
+        if quantize and (
+            (file_type not in ["tif", "tiff"]) or (data_type != "normalized")
+        ):
+            raise ValueError(
+                "quantize export is only available for normalized data in tif files"
+            )
+
         prefix = ""
         if data_type == "normalized":
             data = self.get_normalized_data()
@@ -857,6 +1085,32 @@ class Normalization:
 
         metadata = self.data[data_type]["metadata"]
 
+        if quantize:
+            data, _low, _high = quantize_to_uint16(data=data)
+            # the pixel format of the input files does not apply to the uint16 data
+            _quantized_metadata = []
+            for _metadata in metadata:
+                _tags = {
+                    _tag: _value
+                    for _tag, _value in (_metadata or {}).items()
+                    if _tag not in pixel_format_tags
+                }
+                _tags[quantization_low_tag] = _low
+                _tags[quantization_high_tag] = _high
+                _quantized_metadata.append(_tags)
+            metadata = _quantized_metadata
+
+        if multipage:
+            _stack_name = "{}_stack.{}".format(prefix or data_type, file_type)
+            self._export_file_name = [os.path.join(folder, _stack_name)]
+            make_multipage_tif(
+                data=data,
+                metadata=metadata,
+                file_name=self._export_file_name[0],
+                compression=compression,
+            )
+            return
+
         list_file_name_raw = self.data[data_type]["file_name"]
         self.__create_list_file_names(
             initial_list=list_file_name_raw,
@@ -870,23 +1124,61 @@ class Normalization:
             metadata=metadata,
             output_file_names=self._export_file_name,
             suffix=file_type,
+            compression=compression,
         )
 
-    def __export_data(self, data=[], metadata=[], output_file_names=[], suffix="tif"):
+    def __export_data(
+        self,
+        data=[],
+        metadata=[],
+        output_file_names=[],
+        suffix="tif",
+        compression=None,
+    ):
         """save the list of files with the data specified
 
         Parameters:
             data: numpy array that contains the array of data to save (default [])
             output_file_names: numpy array of string of full file names (default [])
             suffix: String - format in which the file will be created (default 'tif')
+            compression: String - Pillow TIFF compression, None for no compression (default None)
+
+        Raises:
+            ValueError if the number of file names, data and metadata do not match
         """
-        name_data_metadata_array = zip(output_file_names, data, metadata)
-        for _file_name, _data, _metadata in name_data_metadata_array:
-            if suffix in ["tif", "tiff"]:
-                make_tif(data=_data, metadata=_metadata, file_name=_file_name)
-            elif suffix == "fits":
+        # checked before writing anything, a length mismatch would otherwise silently
+        # drop the last images
+        name_data_metadata_array = list(
+            zip(output_file_names, data, metadata, strict=True)
+        )
+
+        # the writer is picked once for all the files
+        if suffix in ["tif", "tiff"]:
+
+            def _export_file(_name_data_metadata):
+                _file_name, _data, _metadata = _name_data_metadata
+                make_tif(
+                    data=_data,
+                    metadata=_metadata,
+                    file_name=_file_name,
+                    compression=compression,
+                )
+
+        elif suffix == "fits":
+
+            def _export_file(_name_data_metadata):
+                _file_name, _data, _metadata = _name_data_metadata
                 make_fits(data=_data, file_name=_file_name)
 
+        else:
+            return
+
+        # every frame goes to its own file, the files are written in parallel.
+        # The results are consumed so an error raised while writing is not lost
+        max_workers = min(os.cpu_count() or 1, 8)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_export_file, name_data_metadata_array))
+
     def __create_list_file_names(
         self, initial_list=[], output_folder="", prefix="", suffix=""
     ):
@@ -900,14 +1192,16 @@ class Normalization:
                 ex: 'normalized' will produce 'normalized_image001.tif'
             suffix: String. extension to file. 'tif' for TIFF and 'fits' for FITS
         """
-        _base_name = [os.path.basename(_file) for _file in initial_list]
-        _raw_name = [os.path.splitext(_file)[0] for _file in _base_name]
         _prefix = ""
         if prefix:
             _prefix = prefix + "_"
+        _join = os.path.join
+        _basename = os.path.basename
+        _splitext = os.path.splitext
+        # all the string work of each file name is done in a single pass
         full_file_names = [
-            os.path.join(output_folder, _prefix + _file + "." + suffix)
-            for _file in _raw_name
+            _join(output_folder, f"{_prefix}{_splitext(_basename(_file))[0]}.{suffix}")
+            for _file in initial_list
         ]
         self._export_file_name = full_file_names
 
@@ -141,3 +141,21 @@ class TestCropping(unittest.TestCase):
         _returned_df = o_norm.data["df"]["data"][0]
         _expected_df = np.ones((3, 3))
         self.assertTrue((_expected_df == _returned_df).all())
+
+    def test_crop_keeps_the_stack_as_a_3d_array(self):
+        """assert crop of the loaded stacks returns a single 3D array of the cropped frames"""
+        x0, y0, x1, y1 = 1, 0, 2, 3
+        _roi = ROI(x0=x0, y0=y0, x1=x1, y1=y1)
+        o_norm = Normalization()
+        sample_path = self.data_path + "/tif/sample"
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        ob_path = self.data_path + "/tif/ob"
+        o_norm.load(folder=ob_path, data_type="ob", auto_gamma_filter=False)
+        _expected_sample = np.copy(
+            o_norm.data["sample"]["data"][:, y0 : y1 + 1, x0 : x1 + 1]
+        )
+        o_norm.crop(roi=_roi)
+        _returned_sample = o_norm.data["sample"]["data"]
+        self.assertIsInstance(_returned_sample, np.ndarray)
+        self.assertEqual((3, 4, 2), _returned_sample.shape)
+        self.assertTrue((_expected_sample == _returned_sample).all())
@@ -1,7 +1,9 @@
 import unittest
 import os
 import shutil
+from unittest import mock
 import numpy as np
+from PIL import Image
 
 from NeuNorm.normalization import Normalization
 
@@ -22,6 +24,18 @@ class TestExportingPhase1(unittest.TestCase):
             IOError, o_norm.export, folder="/unknown/", data_type="sample"
         )
 
+    def test_error_raised_if_folder_is_a_file(self):
+        """assert error is raised when the folder is an existing file"""
+        sample_path = self.data_path + "/tif/sample"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        self.assertRaises(
+            IOError,
+            o_norm.export,
+            folder=os.path.join(sample_path, "image001.tif"),
+            data_type="sample",
+        )
+
     def test_error_raised_if_data_type_is_not_valid(self):
         """assert error is raised if data_type is wrong"""
         sample_path = self.data_path + "/tif/sample"
@@ -40,6 +54,19 @@ class TestExportingPhase1(unittest.TestCase):
         o_norm.load(folder=ob_path, data_type="ob", auto_gamma_filter=False)
         self.assertFalse(o_norm.export(data_type="df"))
 
+    def test_error_raised_if_multipage_is_not_tif(self):
+        """assert error is raised if multipage export is requested for fits"""
+        sample_path = self.data_path + "/tif/sample"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        self.assertRaises(
+            ValueError,
+            o_norm.export,
+            data_type="sample",
+            file_type="fits",
+            multipage=True,
+        )
+
 
 class TestExportingPhase2(unittest.TestCase):
     def setUp(self):
@@ -81,6 +108,29 @@ class TestExportingPhase2(unittest.TestCase):
 
         self.assertTrue(_expected_file_name_0 == _output_file_name_0)
 
+    def test_export_file_names_follow_changed_file_names(self):
+        """assert a second export uses the new file names when they have been changed"""
+        sample_path = self.data_path + "/tif/sample"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        o_norm.export(folder=self.export_folder, data_type="sample")
+
+        o_norm.data["sample"]["file_name"][0] = "/users/me/renamed.tif"
+        o_norm.export(folder=self.export_folder, data_type="sample")
+        _expected_file_name_0 = os.path.join(self.export_folder, "renamed.tif")
+        self.assertEqual(_expected_file_name_0, o_norm._export_file_name[0])
+
+    def test_error_raised_if_metadata_do_not_match_data(self):
+        """assert error is raised and nothing is exported when some metadata are missing"""
+        sample_path = self.data_path + "/tif/sample"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        o_norm.data["sample"]["metadata"] = o_norm.data["sample"]["metadata"][:-1]
+        self.assertRaises(
+            ValueError, o_norm.export, folder=self.export_folder, data_type="sample"
+        )
+        self.assertEqual([], os.listdir(self.export_folder))
+
     def test_export_works_for_tif(self):
         """assert the file created is correct for tif images"""
         sample_path = self.data_path + "/tif/sample"
@@ -95,6 +145,118 @@ class TestExportingPhase2(unittest.TestCase):
 
         self.assertTrue((_sample_0 == _sample_reloaded).all())
 
+    def test_export_works_for_compressed_tif(self):
+        """assert the file created is correct for zlib compressed tif images"""
+        sample_path = self.data_path + "/tif/sample"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        _sample_0 = o_norm.data["sample"]["data"][0]
+        o_norm.export(
+            folder=self.export_folder,
+            data_type="sample",
+            compression="tiff_adobe_deflate",
+        )
+
+        o_norm_2 = Normalization()
+        o_norm_2.load(folder=self.export_folder, auto_gamma_filter=False)
+        _sample_reloaded = o_norm_2.data["sample"]["data"][0]
+
+        self.assertTrue((_sample_0 == _sample_reloaded).all())
+
+    def test_export_works_for_multipage_tif(self):
+        """assert all the images are exported as the pages of a single tif file"""
+        sample_path = self.data_path + "/tif/sample"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        o_norm.export(folder=self.export_folder, data_type="sample", multipage=True)
+
+        _expected_file_name = os.path.join(self.export_folder, "sample_stack.tif")
+        self.assertEqual([_expected_file_name], o_norm._export_file_name)
+
+        _sample = o_norm.data["sample"]["data"]
+        with Image.open(_expected_file_name) as _image:
+            self.assertEqual(len(_sample), _image.n_frames)
+            for _index in np.arange(len(_sample)):
+                _image.seek(_index)
+                self.assertTrue((_sample[_index] == np.asarray(_image)).all())
+
+    def test_export_works_for_multipage_bigtiff(self):
+        """assert all the pages of a larger stack read back from the multipage BigTIFF file"""
+        _stack = np.random.default_rng(0).random((12, 64, 48), dtype=np.float32)
+        o_norm = Normalization()
+        o_norm.load(data=_stack, auto_gamma_filter=False)
+
+        for _compression in [None, "tiff_adobe_deflate"]:
+            o_norm.export(
+                folder=self.export_folder,
+                data_type="sample",
+                compression=_compression,
+                multipage=True,
+            )
+            _file_name = o_norm._export_file_name[0]
+            with open(_file_name, "rb") as _file:
+                _header = _file.read(4)
+            # BigTIFF (uncompressed) or classic TIFF (compressed by libtiff)
+            _expected_header = b"II+\x00" if _compression is None else b"II*\x00"
+            self.assertEqual(_expected_header, _header)
+
+            with Image.open(_file_name) as _image:
+                self.assertEqual(len(_stack), _image.n_frames)
+                for _index in np.arange(len(_stack)):
+                    _image.seek(_index)
+                    self.assertTrue((_stack[_index] == np.asarray(_image)).all())
+
+    def test_error_raised_if_compressed_multipage_tif_is_too_large(self):
+        """assert error is raised before writing when a compressed multipage file could be over 4 GiB"""
+        o_norm = Normalization()
+        o_norm.load(data=np.ones((3, 5, 5)), auto_gamma_filter=False)
+        # 3 frames of 5x5 float32 are 300 bytes
+        with mock.patch("NeuNorm.exporter.classic_tiff_max_nbytes", 299):
+            self.assertRaises(
+                ValueError,
+                o_norm.export,
+                folder=self.export_folder,
+                data_type="sample",
+                compression="tiff_adobe_deflate",
+                multipage=True,
+            )
+        self.assertEqual([], os.listdir(self.export_folder))
+
+    def test_error_raised_if_multipage_tif_is_too_large_without_big_tiff(self):
+        """assert error is raised before writing a multipage file over 4 GiB with a Pillow without BigTIFF"""
+        o_norm = Normalization()
+        o_norm.load(data=np.ones((3, 5, 5)), auto_gamma_filter=False)
+        with mock.patch("NeuNorm.exporter.classic_tiff_max_nbytes", 299):
+            with mock.patch("NeuNorm.exporter.big_tiff_supported", False):
+                self.assertRaises(
+                    ValueError,
+                    o_norm.export,
+                    folder=self.export_folder,
+                    data_type="sample",
+                    multipage=True,
+                )
+        self.assertEqual([], os.listdir(self.export_folder))
+
+    def test_export_works_for_quantized_tif(self):
+        """assert normalized data exported as uint16 can be recovered from the saved range"""
+        sample_path = self.data_path + "/tif/sample"
+        ob_path = self.data_path + "/tif/ob"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_path, auto_gamma_filter=False)
+        o_norm.load(folder=ob_path, data_type="ob", auto_gamma_filter=False)
+        o_norm.normalization()
+        o_norm.export(folder=self.export_folder, quantize=True)
+
+        _normalized_0 = o_norm.data["normalized"][0]
+        with Image.open(o_norm._export_file_name[0]) as _image:
+            _quantized_0 = np.asarray(_image)
+            _low = _image.tag_v2[65000]
+            _high = _image.tag_v2[65001]
+        self.assertEqual(np.uint16, _quantized_0.dtype)
+        _recovered_0 = _quantized_0 * (_high - _low) / 65535 + _low
+        _precision = (_high - _low) / 65535
+        self.assertTrue(np.allclose(_normalized_0, _recovered_0, atol=_precision))
+
     def test_export_works_for_tiff_metadata(self):
         """assert file created using tif has the metadata as well"""
         sample_path = self.data_path + "/tif/sample"
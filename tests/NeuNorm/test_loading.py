@@ -1,8 +1,15 @@
 import unittest
 import numpy as np
 import os
+import gc
+import tempfile
+import weakref
+from PIL import Image
+from astropy.io import fits
 
+from NeuNorm import _utilities
 from NeuNorm.normalization import Normalization
+from NeuNorm.roi import ROI
 
 
 class TestLoading(unittest.TestCase):
@@ -167,6 +174,91 @@ class TestLoading(unittest.TestCase):
         _loaded_name_2 = o_norm.data["sample"]["file_name"][1]
         self.assertTrue(_expected_name_2 == _loaded_name_2)
 
+    def test_data_stored_as_a_single_3d_array(self):
+        """assert frames loaded one at a time or by folder are stored in a 3D array"""
+        sample_tif_file_1 = self.data_path + "/tif/sample/image001.tif"
+        sample_tif_file_2 = self.data_path + "/tif/sample/image002.tif"
+        o_norm = Normalization()
+        o_norm.load(file=sample_tif_file_1, auto_gamma_filter=False)
+        o_norm.load(file=sample_tif_file_2, auto_gamma_filter=False)
+        o_norm.load(data=np.zeros((2, 5, 5)), auto_gamma_filter=False)
+        _loaded_data = o_norm.data["sample"]["data"]
+        self.assertTrue(isinstance(_loaded_data, np.ndarray))
+        self.assertEqual((4, 5, 5), _loaded_data.shape)
+        self.assertTrue(_loaded_data.flags["C_CONTIGUOUS"])
+        self.assertEqual(4, len(o_norm.data["sample"]["file_name"]))
+        self.assertTrue((_loaded_data[2:] == 0).all())
+
+        path = self.data_path + "/fits/ob"
+        o_norm.load(folder=path, data_type="ob", auto_gamma_filter=False)
+        _loaded_ob = o_norm.data["ob"]["data"]
+        self.assertTrue(isinstance(_loaded_ob, np.ndarray))
+        self.assertEqual((3, 5, 5), _loaded_ob.shape)
+
+    def test_loading_integer_files_without_gamma_filter(self):
+        """assert uint16 tif and big-endian fits files are loaded one at a time and by folder"""
+        _frames = np.arange(3 * 5 * 5, dtype=np.uint16).reshape(3, 5, 5)
+        with tempfile.TemporaryDirectory() as folder:
+            list_files = []
+            for _index, _frame in enumerate(_frames):
+                _file_name = os.path.join(folder, "image{:03}.tif".format(_index))
+                Image.fromarray(_frame).save(_file_name)
+                list_files.append(_file_name)
+
+            o_norm = Normalization()
+            for _file_name in list_files:
+                o_norm.load(file=_file_name, auto_gamma_filter=False)
+            self.assertTrue((o_norm.data["sample"]["data"] == _frames).all())
+
+            o_norm = Normalization()
+            o_norm.load(
+                folder=folder, auto_gamma_filter=False, manual_gamma_filter=True
+            )
+            self.assertEqual((3, 5, 5), o_norm.data["sample"]["data"].shape)
+
+        with tempfile.TemporaryDirectory() as folder:
+            list_files = []
+            for _index, _frame in enumerate(_frames):
+                _file_name = os.path.join(folder, "image{:03}.fits".format(_index))
+                fits.PrimaryHDU(_frame.astype(">u2")).writeto(_file_name)
+                list_files.append(_file_name)
+
+            o_norm = Normalization()
+            for _file_name in list_files:
+                o_norm.load(file=_file_name, auto_gamma_filter=False)
+            self.assertTrue((o_norm.data["sample"]["data"] == _frames).all())
+
+            o_norm = Normalization()
+            o_norm.load(folder=folder, auto_gamma_filter=False)
+            self.assertTrue((o_norm.data["sample"]["data"] == _frames).all())
+
+    def test_loading_buffer_has_no_unused_frames(self):
+        """assert the buffer kept by the data only holds the frames loaded"""
+        sample_tif_file = self.data_path + "/tif/sample/image001.tif"
+        o_norm = Normalization()
+        for _ in range(5):
+            o_norm.load(file=sample_tif_file, auto_gamma_filter=False)
+        o_norm.load(data=np.ones((5, 5)))
+        self.assertEqual((6, 5, 5), o_norm.data["sample"]["data"].base.shape)
+
+        path = self.data_path + "/tif/ob"
+        o_norm.load(folder=path, data_type="ob", auto_gamma_filter=False)
+        o_norm.load(folder=path, data_type="ob", auto_gamma_filter=False)
+        self.assertEqual((6, 5, 5), o_norm.data["ob"]["data"].base.shape)
+
+    def test_loading_buffer_is_freed_when_data_are_replaced(self):
+        """assert the loading buffers are not kept once normalization replaced the data"""
+        o_norm = Normalization()
+        o_norm.load(data=np.ones((4, 20, 20)), auto_gamma_filter=False)
+        o_norm.load(data=np.ones((4, 20, 20)), data_type="ob", auto_gamma_filter=False)
+        _sample_buffer = weakref.ref(o_norm.data["sample"]["data"].base)
+        _ob_buffer = weakref.ref(o_norm.data["ob"]["data"].base)
+
+        o_norm.normalization(roi=ROI(x0=0, y0=0, x1=4, y1=4))
+        gc.collect()
+        self.assertIsNone(_sample_buffer())
+        self.assertIsNone(_ob_buffer())
+
     def test_all_images_names_retrieved_from_folder(self):
         """assert list_of images are correctly loaded when retrieved from folder"""
         # tif
@@ -210,6 +302,22 @@ class TestLoading(unittest.TestCase):
         o_norm.load(file=df1, auto_gamma_filter=False)
         self.assertRaises(IOError, o_norm.load, file=df2, auto_gamma_filter=False)
 
+    def test_data_of_different_size_loaded_without_check_shape(self):
+        """assert files of different size can be loaded when check_shape is False"""
+        image1 = self.data_path + "/tif/sample/image001.tif"
+        image2 = self.data_path + "/different_format/image001_4_by_4.tif"
+        image3 = self.data_path + "/tif/sample/image002.tif"
+        o_norm = Normalization()
+        o_norm.load(file=image1, auto_gamma_filter=False, check_shape=False)
+        o_norm.load(file=image2, auto_gamma_filter=False, check_shape=False)
+        o_norm.load(file=image3, auto_gamma_filter=False, check_shape=False)
+        _loaded_data = o_norm.data["sample"]["data"]
+        self.assertEqual(3, len(_loaded_data))
+        self.assertEqual(
+            [(5, 5), (4, 4), (5, 5)], [np.shape(_data) for _data in _loaded_data]
+        )
+        self.assertEqual(3, len(o_norm.data["sample"]["file_name"]))
+
     def test_loading_new_data_not_allowed_if_algorithm_already_run(self):
         """assert error raises when loading new data on data already manipulated"""
         # tiff
@@ -290,6 +398,23 @@ class TestGammaFiltering(unittest.TestCase):
         _returned_sample = o_norm.data["sample"]["data"]
         self.assertTrue((_expected_sample == _returned_sample).all())
 
+    @unittest.skipIf(_utilities.njit is None, "numba is not installed")
+    def test_auto_gamma_filtered_works_with_threaded_loading(self):
+        """assert the numba gamma filter gives the right result when many files are loaded in parallel"""
+        _frame = np.full((20, 20), 100, dtype=np.uint16)
+        _frame[5, 5] = 65535
+        _frame[12, 7] = 65535
+        with tempfile.TemporaryDirectory() as folder:
+            for _index in range(32):
+                _file_name = os.path.join(folder, "image{:03}.tif".format(_index))
+                Image.fromarray(_frame).save(_file_name)
+            o_norm = Normalization()
+            o_norm.load(folder=folder)
+
+        _returned_sample = o_norm.data["sample"]["data"]
+        self.assertEqual((32, 20, 20), _returned_sample.shape)
+        self.assertTrue((_returned_sample == 100).all())
+
     def test_auto_gamma_filtered_works(self):
         """assert auto gamma filter works"""
         file_name = self.data_path + "/different_format/image001_with_gamma.tif"
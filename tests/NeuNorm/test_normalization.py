@@ -0,0 +1,70 @@
+import os
+import unittest
+
+import numpy as np
+
+from NeuNorm.normalization import Normalization
+from NeuNorm.roi import ROI
+
+
+class TestNormalization(unittest.TestCase):
+    def setUp(self):
+        _file_path = os.path.dirname(__file__)
+        self.data_path = os.path.abspath(os.path.join(_file_path, "../data/"))
+
+    def test_normalized_data_stored_as_a_single_3d_array(self):
+        """assert normalized data is stored as 1 array of shape (nbr_sample, height, width)"""
+        sample_tif_folder = self.data_path + "/tif/sample/"
+        ob_tif_folder = self.data_path + "/tif/ob/"
+        o_norm = Normalization()
+        o_norm.load(folder=sample_tif_folder, auto_gamma_filter=False)
+        o_norm.load(folder=ob_tif_folder, data_type="ob", auto_gamma_filter=False)
+        o_norm.normalization()
+        _normalized = o_norm.get_normalized_data()
+        self.assertIsInstance(_normalized, np.ndarray)
+        self.assertEqual((3, 5, 5), _normalized.shape)
+
+    def test_normalized_pixels_are_0_where_ob_is_0(self):
+        """assert pixels where ob is 0 are set to 0 when input arrays are type int"""
+        sample = np.full((2, 4, 5), 3, dtype=int)
+        ob = np.full((2, 4, 5), 3, dtype=int)
+        ob[0, 0, 0] = 0
+        o_norm = Normalization()
+        o_norm.load(data=sample, auto_gamma_filter=False)
+        o_norm.load(data=ob, data_type="ob", auto_gamma_filter=False)
+        o_norm.normalization()
+
+        _normalized = o_norm.get_normalized_data()
+        self.assertEqual(0, _normalized[0][0, 0])
+        self.assertEqual(1, _normalized[1][0, 0])
+        self.assertTrue((_normalized[0].ravel()[1:] == 1).all())
+
+    def test_normalization_with_small_and_large_roi(self):
+        """assert roi counts are the same whether they are summed or read from the integral image"""
+        sample = np.arange(20, dtype=np.float32).reshape(4, 5) + 1
+        ob = np.ones((4, 5), dtype=np.float32)
+
+        # the 2 roi cover fewer pixels than the image: each roi is summed
+        list_small_roi = [ROI(x0=1, y0=1, x1=3, y1=2), ROI(x0=0, y0=0, x1=1, y1=1)]
+        # the 3 roi cover more pixels than the image: integral image
+        list_large_roi = [
+            ROI(x0=0, y0=0, x1=4, y1=3),
+            ROI(x0=1, y0=1, x1=3, y1=2),
+            ROI(x0=2, y0=0, x1=4, y1=3),
+        ]
+        list_expected_counts = [
+            [np.sum(sample[1:3, 1:4]) + np.sum(sample[0:2, 0:2]), 6 + 4],
+            [np.sum(sample) + np.sum(sample[1:3, 1:4]) + np.sum(sample[:, 2:]), 38],
+        ]
+
+        for _list_roi, [_total_counts, _total_number_of_pixels] in zip(
+            [list_small_roi, list_large_roi], list_expected_counts
+        ):
+            o_norm = Normalization()
+            o_norm.load(data=sample, auto_gamma_filter=False)
+            o_norm.load(data=ob, data_type="ob", auto_gamma_filter=False)
+            o_norm.normalization(roi=_list_roi)
+
+            _norm_expected = sample / (_total_counts / _total_number_of_pixels)
+            _norm_returned = o_norm.get_normalized_data()[0]
+            self.assertTrue(np.allclose(_norm_expected, _norm_returned, rtol=1e-5))
@@ -1,9 +1,15 @@
 import unittest
 import numpy as np
 import os
+from scipy.ndimage import convolve
 
 from NeuNorm.normalization import Normalization
-from NeuNorm._utilities import get_sorted_list_images, average_df
+from NeuNorm._utilities import (
+    get_sorted_list_images,
+    average_df,
+    replace_gamma_pixels,
+    quantize_to_uint16,
+)
 
 
 class TestUtilites(unittest.TestCase):
@@ -40,3 +46,37 @@ class TestUtilites(unittest.TestCase):
         expected_df = np.ones([5, 5])
         expected_df[0, 0] = 5
         self.assertTrue((expected_df == _average_df).all())
+
+    def test_replace_gamma_pixels(self):
+        """assert gamma pixels are replaced by the same values as a 3x3 mean convolution"""
+        gamma_indexes = (np.array([0, 0, 2, 4, 4]), np.array([0, 1, 3, 5, 2]))
+        mean_kernel = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]]) / 8.0
+
+        for _dtype in [np.float32, np.uint16, ">u2"]:
+            data = np.arange(30).reshape(5, 6).astype(_dtype)
+
+            expected_data = np.copy(data)
+            convolved_data = convolve(data, mean_kernel, mode="constant")
+            expected_data[gamma_indexes] = convolved_data[gamma_indexes]
+
+            returned_data = replace_gamma_pixels(
+                data=np.copy(data), gamma_indexes=gamma_indexes
+            )
+            self.assertTrue(np.allclose(expected_data, returned_data))
+
+    def test_quantize_to_uint16(self):
+        """assert data are mapped to uint16 between the percentiles and can be recovered"""
+        data = np.linspace(0, 2, 3 * 20 * 20, dtype=np.float32).reshape(3, 20, 20)
+        data[0, 0, 0] = -10
+        data[2, 19, 19] = 10
+
+        quantized, low, high = quantize_to_uint16(data=data, percentiles=(1, 99))
+        self.assertEqual(np.uint16, quantized.dtype)
+        self.assertEqual(data.shape, quantized.shape)
+        self.assertEqual(0, quantized[0, 0, 0])
+        self.assertEqual(65535, quantized[2, 19, 19])
+
+        inside = (data >= low) & (data <= high)
+        recovered = quantized * (high - low) / 65535 + low
+        precision = (high - low) / 65535
+        self.assertTrue(np.allclose(data[inside], recovered[inside], atol=precision))